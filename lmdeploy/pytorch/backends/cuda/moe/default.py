@@ -36,8 +36,15 @@ class TritonFusedMoEImpl(FusedMoEImpl):
         num_experts = self.num_experts
         expert_per_rank = (num_experts + world_size - 1) // world_size
         first_expert = rank * expert_per_rank
+        assert first_expert < num_experts, (f'ep world size {world_size} leaves rank {rank} without experts '
+                                            f'(num_experts={num_experts}).')
         last_expert = min(first_expert + expert_per_rank, num_experts)
-        return list(range(first_expert, last_expert))
+        expert_list = list(range(first_expert, last_expert))
+        # pad the ragged last rank with its own last expert so every rank
+        # holds expert_per_rank weights; routing resolves an expert id to
+        # its first slot, so the padded slots are never addressed.
+        expert_list += [expert_list[-1]] * (expert_per_rank - len(expert_list))
+        return expert_list
 
     def forward(self,
                 hidden_states: torch.Tensor,
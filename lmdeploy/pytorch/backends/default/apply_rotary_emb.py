@@ -1,19 +1,23 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-import torch
 from torch import Tensor
 
 from ..apply_rotary_emb import ApplyRotaryEmbBuilder, ApplyRotaryEmbImpl
 
 
-def rotate_half(x):
-    """Rotates half the hidden dims of the input."""
+def _rotate_pairs_inplace(x: Tensor, cos: Tensor, sin: Tensor):
+    """Rotate the paired halves of x in place.
+
+    Implements ``x * cos + rotate_half(x) * sin`` on the two half views
+    directly, so the only temporary is a half-size copy of the first half
+    instead of a full-size rotate_half buffer.
+    """
     half_size = x.shape[-1] // 2
     x1 = x[..., :half_size]
     x2 = x[..., half_size:]
-    out = torch.empty_like(x)
-    out[..., :half_size] = -x2
-    out[..., half_size:] = x1
-    return out
+    x1_old = x1.clone()
+    x1.mul_(cos).addcmul_(x2, sin, value=-1)
+    x2.mul_(cos).addcmul_(x1_old, sin)
+    return x
 
 
 class DefaultApplyRotaryEmbImpl(ApplyRotaryEmbImpl):
@@ -22,20 +26,15 @@ class DefaultApplyRotaryEmbImpl(ApplyRotaryEmbImpl):
     def forward(self, query: Tensor, key: Tensor, cos: Tensor, sin: Tensor, inplace: bool = True):
         """forward."""
         unsqueeze_dim = -2
-        cos = cos.unsqueeze(unsqueeze_dim)
-        sin = sin.unsqueeze(unsqueeze_dim)
-        if inplace:
-            q_embed = query
-            k_embed = key
-            q_sin = rotate_half(query) * sin
-            q_embed.mul_(cos)
-            q_embed.add_(q_sin)
-            k_sin = rotate_half(key) * sin
-            k_embed.mul_(cos)
-            k_embed.add_(k_sin)
-        else:
-            q_embed = (query * cos) + (rotate_half(query) * sin)
-            k_embed = (key * cos) + (rotate_half(key) * sin)
+        # cos/sin repeat the half-dim frequencies twice, read one half.
+        half_size = query.shape[-1] // 2
+        cos = cos[..., :half_size].unsqueeze(unsqueeze_dim)
+        sin = sin[..., :half_size].unsqueeze(unsqueeze_dim)
+        if not inplace:
+            query = query.clone()
+            key = key.clone()
+        q_embed = _rotate_pairs_inplace(query, cos, sin)
+        k_embed = _rotate_pairs_inplace(key, cos, sin)
         return q_embed, k_embed
 
 
@@ -6,6 +6,8 @@ import torch
 import torch.nn.functional as F
 from torch import nn
 
+from lmdeploy.pytorch.model_inputs import get_step_ctx_manager
+
 from ..rotary_embedding import (FopeParameters, Llama3Parameters, LongRoPEScalingParameters, RopeType,
                                 RotaryEmbeddingBuilder, RotaryEmbeddingImpl, YarnParameters)
 
@@ -29,39 +31,83 @@ def _rotary_embedding_fwd(position_ids: torch.Tensor,
     device_type = device_type if isinstance(device_type, str) and device_type != 'mps' else 'cpu'
     with torch.autocast(device_type=device_type, enabled=False):
         freqs = (inv_freq_expanded.float() @ position_ids_expanded.float()).transpose(1, 2)
-        emb = freqs.repeat(1, 1, 2)
-        cos = emb.cos()
-        sin = emb.sin()
+        # compute cos/sin on the half dim, then repeat to the full dim.
+        cos = freqs.cos()
+        sin = freqs.sin()
 
         if mscale is not None:
             cos = cos * mscale
             sin = sin * mscale
 
+        cos = cos.repeat(1, 1, 2)
+        sin = sin.repeat(1, 1, 2)
+
     return cos.to(dtype=dtype), sin.to(dtype=dtype)
 
 
 class RotaryEmbeddingImpl(RotaryEmbeddingImpl, nn.Module):
     """Base rotary embedding."""
 
-    def __init__(self, dim: int, base: int = 10000, scaling_factor: float = 1.0):
+    def __init__(self, dim: int, base: int = 10000, scaling_factor: float = 1.0, max_position_embeddings: int = 2048):
         super().__init__()
         self.scaling_factor = scaling_factor
         self.dim = dim
         self.base = base
+        self.max_position_embeddings = max_position_embeddings
+        # linear scaling keeps the original max_position_embeddings in
+        # the config while positions reach scaling_factor times further.
+        self._cache_len = int(max_position_embeddings * max(scaling_factor, 1.0))
         inv_freq = 1.0 / (self.base**(torch.arange(0, self.dim, 2, dtype=torch.int64).float() / self.dim))
         self.register_buffer('inv_freq', inv_freq, persistent=False)
+        self._cos_cached = None
+        self._sin_cached = None
+
+    @staticmethod
+    def _max_seqlen(position_ids: torch.Tensor):
+        """Get an upper bound of position ids, host int without a sync."""
+        step_ctx = get_step_ctx_manager().current_context()
+        if step_ctx is not None and step_ctx.max_kv_seqlen is not None:
+            return step_ctx.max_kv_seqlen
+        return int(position_ids.max()) + 1
+
+    def _build_cos_sin_cache(self, dtype: torch.dtype, device: torch.device):
+        """Build the cos/sin table once per device/dtype.
+
+        The table is allocated at its full capacity up front and never
+        grown, so eager callers can hold on to gathered views safely.
+        """
+        cached = self._cos_cached
+        if cached is not None and cached.device == device and cached.dtype == dtype:
+            return
+        position_ids = torch.arange(self._cache_len, device=device)[None]
+        cos, sin = _rotary_embedding_fwd(position_ids,
+                                         self.inv_freq,
+                                         scaling_factor=self.scaling_factor,
+                                         dtype=dtype,
+                                         device_type=device.type)
+        self._cos_cached = cos[0]
+        self._sin_cached = sin[0]
 
     def forward(self, x: torch.Tensor, position_ids: torch.Tensor):
         """forward."""
-        device_type = x.device.type
-        dtype = x.dtype
         if self.inv_freq.device != x.device:
             self.inv_freq = self.inv_freq.to(x.device)
-        return _rotary_embedding_fwd(position_ids,
-                                     self.inv_freq,
-                                     scaling_factor=self.scaling_factor,
-                                     dtype=dtype,
-                                     device_type=device_type)
+        use_direct = self._max_seqlen(position_ids) > self._cache_len
+        if x.is_cuda and torch.cuda.is_current_stream_capturing():
+            # a captured graph replays without re-running the python range
+            # check, so it must not bake in the table gather; the direct
+            # computation is exact for any replayed position.
+            use_direct = True
+        if use_direct:
+            return _rotary_embedding_fwd(position_ids,
+                                         self.inv_freq,
+                                         scaling_factor=self.scaling_factor,
+                                         dtype=x.dtype,
+                                         device_type=x.device.type)
+        self._build_cos_sin_cache(x.dtype, x.device)
+        # belt-and-suspenders bound for the eager gather.
+        position_ids = position_ids.clamp_max(self._cache_len - 1)
+        return self._cos_cached[position_ids], self._sin_cached[position_ids]
 
 
 class LlamaDynamicNTKScalingRotaryEmbedding(RotaryEmbeddingImpl):
@@ -111,8 +157,9 @@ class Llama3RotaryEmbeddingImpl(RotaryEmbeddingImpl):
         low_freq_factor: float = 1.0,
         high_freq_factor: float = 4.0,
         original_max_position_embeddings: int = 8194,
+        max_position_embeddings: int = 2048,
     ):
-        super().__init__(dim, base, scaling_factor)
+        super().__init__(dim, base, scaling_factor, max_position_embeddings)
         old_context_len = original_max_position_embeddings
         low_freq_wavelen = old_context_len / low_freq_factor
         high_freq_wavelen = old_context_len / high_freq_factor
@@ -350,13 +397,17 @@ class DefaultRotaryEmbeddingBuilder(RotaryEmbeddingBuilder):
     ):
         """build."""
         if emb_type in (RopeType.Default, RopeType.LinearScaling):
-            return RotaryEmbeddingImpl(dim, base, scaling_factor)
+            return RotaryEmbeddingImpl(dim, base, scaling_factor, max_position_embeddings)
         elif emb_type == RopeType.DynamicNTKScaling:
             return LlamaDynamicNTKScalingRotaryEmbedding(dim, base, scaling_factor, max_position_embeddings)
         elif emb_type == RopeType.Llama3:
-            return Llama3RotaryEmbeddingImpl(dim, base, scaling_factor, llama3_params.low_freq_factor,
+            return Llama3RotaryEmbeddingImpl(dim,
+                                             base,
+                                             scaling_factor,
+                                             llama3_params.low_freq_factor,
                                              llama3_params.high_freq_factor,
-                                             llama3_params.original_max_position_embeddings)
+                                             llama3_params.original_max_position_embeddings,
+                                             max_position_embeddings=max_position_embeddings)
         elif emb_type == RopeType.Yarn:
             return YarnRotaryEmbeddingImpl(dim, base, scaling_factor, max_position_embeddings, yarn_params=yarn_params)
         elif emb_type == RopeType.LongRoPEScaling:
@@ -35,10 +35,12 @@ class SocVersion:
                            'Please check your Ascend environment configuration.')
 
     @classmethod
+    @lru_cache(maxsize=1)
     def is_Ascend310P(cls) -> bool:
         return cls.device_name().startswith(cls.Ascend310P)
 
     @classmethod
+    @lru_cache(maxsize=1)
     def is_Ascend910(cls) -> bool:
         return cls.device_name().startswith(cls.Ascend910)
 
@@ -53,37 +55,33 @@ class AscendKVQuantMeta:
             data = file.read()
         scale_offset_pairs = re.findall(r'scale:\s*([\d\.\-]+)\s*offset:\s*(-?\d+)', data)
         scale_offset_pairs = [(float(scale), float(offset)) for scale, offset in scale_offset_pairs]
-        k_scales, v_scales, kv_scales = [], [], []
-        k_zeros, v_zeros, kv_zeros = [], [], []
         if len(scale_offset_pairs) == total_layers:
-            for scale, offset in scale_offset_pairs:
-                k_scales.append(torch.tensor([scale], device=device, dtype=dtype))
-                v_scales.append(torch.tensor([scale], device=device, dtype=dtype))
-                kv_scales.append(torch.tensor([scale, scale], device=device, dtype=dtype))
-                k_zeros.append(torch.tensor([offset], device=device, dtype=dtype))
-                v_zeros.append(torch.tensor([offset], device=device, dtype=dtype))
-                kv_zeros.append(torch.tensor([offset, offset], device=device, dtype=dtype))
+            k_pairs = v_pairs = scale_offset_pairs
         elif len(scale_offset_pairs) == total_layers * 2:
-            for i in range(total_layers):
-                scale_k, offset_k = scale_offset_pairs[2 * i]
-                scale_v, offset_v = scale_offset_pairs[2 * i + 1]
-                k_scales.append(torch.tensor([scale_k], device=device, dtype=dtype))
-                v_scales.append(torch.tensor([scale_v], device=device, dtype=dtype))
-                kv_scales.append(torch.tensor([scale_k, scale_v], device=device, dtype=dtype))
-                k_zeros.append(torch.tensor([offset_k], device=device, dtype=dtype))
-                v_zeros.append(torch.tensor([offset_v], device=device, dtype=dtype))
-                kv_zeros.append(torch.tensor([offset_k, offset_v], device=device, dtype=dtype))
+            k_pairs = scale_offset_pairs[0::2]
+            v_pairs = scale_offset_pairs[1::2]
         else:
             raise ValueError(f'num of scale_offset_pairs({len(scale_offset_pairs)}) '
                              f'must match num of total_layers({total_layers})')
 
+        # build each category on host and upload it in one transfer,
+        # then unbind into the per-layer tensors the attention op expects.
+        k_scales = torch.tensor([[scale] for scale, _ in k_pairs], dtype=dtype).to(device)
+        v_scales = torch.tensor([[scale] for scale, _ in v_pairs], dtype=dtype).to(device)
+        k_zeros = torch.tensor([[offset] for _, offset in k_pairs], dtype=dtype).to(device)
+        v_zeros = torch.tensor([[offset] for _, offset in v_pairs], dtype=dtype).to(device)
+        kv_scales = torch.tensor([[k_scale, v_scale] for (k_scale, _), (v_scale, _) in zip(k_pairs, v_pairs)],
+                                 dtype=dtype).to(device)
+        kv_zeros = torch.tensor([[k_zero, v_zero] for (_, k_zero), (_, v_zero) in zip(k_pairs, v_pairs)],
+                                dtype=dtype).to(device)
+
         cls.quant_meta.update({
-            'k_scales': itertools.cycle(k_scales),
-            'k_zeros': itertools.cycle(k_zeros),
-            'v_scales': itertools.cycle(v_scales),
-            'v_zeros': itertools.cycle(v_zeros),
-            'kv_scales': itertools.cycle(kv_scales),
-            'kv_zeros': itertools.cycle(kv_zeros)
+            'k_scales': itertools.cycle(k_scales.unbind(0)),
+            'k_zeros': itertools.cycle(k_zeros.unbind(0)),
+            'v_scales': itertools.cycle(v_scales.unbind(0)),
+            'v_zeros': itertools.cycle(v_zeros.unbind(0)),
+            'kv_scales': itertools.cycle(kv_scales.unbind(0)),
+            'kv_zeros': itertools.cycle(kv_zeros.unbind(0))
         })
         cls.has_set_value = True
 
@@ -92,7 +90,25 @@ class AscendOpsBackend(DlinferOpsBackend):
     """Ascend layer backend."""
     enable_graph = False
     half_negative_inf = torch.finfo(torch.float16).min
-    total_slots = None
+    _pinned_pool: Dict = {}
+
+    @classmethod
+    def _to_pinned_cpu(cls, tensor: torch.Tensor) -> torch.Tensor:
+        """Copy a small 1D device tensor to host through a pinned buffer.
+
+        Pinned staging keeps the D2H copy on the DMA fast path and avoids
+        allocating pageable host memory every step. Two buffers per dtype
+        are rotated so the previous step's metadata stays valid.
+        """
+        numel = tensor.numel()
+        pool = cls._pinned_pool.setdefault(tensor.dtype, [None, None])
+        buf = pool.pop(0)
+        if buf is None or buf.numel() < numel:
+            buf = torch.empty(max(numel, 512), dtype=tensor.dtype, pin_memory=True)
+        pool.append(buf)
+        out = buf[:numel]
+        out.copy_(tensor)
+        return out
 
     @staticmethod
     def get_name() -> str:
@@ -148,28 +164,17 @@ class AscendOpsBackend(DlinferOpsBackend):
     @classmethod
     def update_step_context(cls, step_context):
         """Update step context."""
-
-        def get_total_slots():
-            if cls.total_slots is None:
-                cls.total_slots = torch.arange(block_num * block_size,
-                                               dtype=torch.long,
-                                               device=step_context.block_offsets.device)
-                cls.total_slots = cls.total_slots.view(block_num, block_size)
-            return cls.total_slots
-
-        kv_start_indices, attention_mask = [], []
+        attention_mask = []
         if SocVersion.is_Ascend910():
             block_num, block_size, *_ = step_context.kv_caches[0][0].shape
         elif SocVersion.is_Ascend310P():
             block_num, _, block_size, _ = step_context.kv_caches[0][0].shape
 
-        is_unpaged_prefill = False
-        if not step_context.is_decoding:
-            is_unpaged_prefill = \
-                all((step_context.q_seqlens ==
-                     step_context.kv_seqlens).tolist())
         q_seqlens_list = step_context.q_seqlens.tolist()
         kv_seqlens_list = step_context.kv_seqlens.tolist()
+        is_unpaged_prefill = False
+        if not step_context.is_decoding:
+            is_unpaged_prefill = q_seqlens_list == kv_seqlens_list
         max_q_seq_len = max(q_seqlens_list)
         max_kv_seq_len = max(kv_seqlens_list)
 
@@ -181,30 +186,22 @@ class AscendOpsBackend(DlinferOpsBackend):
             last_block = step_context.block_offsets.gather(1, block_num.view(-1, 1)).view(-1)
             kv_start_indices = last_block * block_size + idx
         else:
-            for i in range(step_context.q_start_loc.size(0)):
-                q_seq_len = q_seqlens_list[i]
-                kv_seq_len = kv_seqlens_list[i]
-
-                # collect kv start indices during the prefill phase.
-                history_length = kv_seq_len - q_seq_len
-                total_slots = get_total_slots()
-                slot_tables = total_slots[step_context.block_offsets[i]].view(-1)
-                slots = slot_tables[history_length:kv_seq_len]
-                kv_start_indices.append(slots)
-
-                # collect attention mask of paged_prefill attention stage.
-                if not is_unpaged_prefill:
-                    single_attention_mask = torch.logical_not(
-                        torch.tril(
-                            torch.ones(q_seq_len,
-                                       step_context.block_offsets.shape[1] * block_size,
-                                       dtype=torch.bool,
-                                       device=step_context.block_offsets.device),
-                            diagonal=kv_seq_len - q_seq_len,
-                        ))
-                    attention_mask.append(single_attention_mask)
-
-            kv_start_indices = torch.cat(kv_start_indices)
+            # collect kv start indices of all prefill tokens at once,
+            # (one slot per token, laid out sequence by sequence)
+            device = step_context.block_offsets.device
+            num_tokens = sum(q_seqlens_list)
+            batch_ids = torch.arange(step_context.q_seqlens.size(0), device=device)\
+                .repeat_interleave(step_context.q_seqlens)
+            token_pos = (step_context.kv_seqlens - step_context.q_seqlens - step_context.q_start_loc)[batch_ids] \
+                + torch.arange(num_tokens, device=device)
+            block_ids = step_context.block_offsets[batch_ids, token_pos // block_size]
+            kv_start_indices = block_ids.long() * block_size + token_pos % block_size
+
+            # collect attention mask of paged_prefill attention stage,
+            # (each token attends to kv positions up to its own)
+            if not is_unpaged_prefill:
+                kv_range = torch.arange(step_context.block_offsets.shape[1] * block_size, device=device)
+                attention_mask.append(kv_range[None, :] > token_pos[:, None])
 
         if step_context.is_decoding:
             # prepare some params of paged_decode attention stage.
@@ -212,7 +209,7 @@ class AscendOpsBackend(DlinferOpsBackend):
         elif is_unpaged_prefill:
             # prepare some params of unpaged_prefill attention stage.
             q_start_loc_cpu, kv_seqlens_cpu = None, None
-            q_seqlens_cpu = step_context.q_seqlens.cpu().to(torch.int32)
+            q_seqlens_cpu = cls._to_pinned_cpu(step_context.q_seqlens.to(torch.int32))
             if SocVersion.is_Ascend910():
                 single_attention_mask = torch.logical_not(
                     torch.tril(
@@ -240,7 +237,6 @@ class AscendOpsBackend(DlinferOpsBackend):
         else:
             # prepare some params of paged_prefill attention stage.
             q_start_loc_cpu, q_seqlens_cpu = None, None
-            attention_mask = [torch.cat([mask for mask in attention_mask])]
 
         if cls.enable_graph:
             kv_start_indices = kv_start_indices.view(-1).to(torch.int32)
@@ -271,11 +267,12 @@ class AscendOpsBackend(DlinferOpsBackend):
                     kv_seqlens = kv_seqlens.repeat_interleave(step_context.q_seqlens, 0)
         else:
             if step_context.is_decoding:
-                kv_seqlens_cpu = step_context.kv_seqlens.cpu().to(torch.int32)
+                kv_seqlens_cpu = cls._to_pinned_cpu(step_context.kv_seqlens.to(torch.int32))
             elif is_unpaged_prefill:
                 pass
             else:
-                kv_seqlens_cpu = step_context.kv_seqlens.repeat_interleave(step_context.q_seqlens, 0).cpu()
+                kv_seqlens_cpu = cls._to_pinned_cpu(step_context.kv_seqlens.repeat_interleave(step_context.q_seqlens,
+                                                                                              0))
                 block_offsets_int32 = step_context.block_offsets.to(torch.int32)
                 step_context.block_offsets = block_offsets_int32\
                     .repeat_interleave(step_context.q_seqlens, 0)
@@ -1148,8 +1148,9 @@ class BaseModelAgent:
                     if not hasattr(mod, 'update_weights'):
                         continue
                     mod.update_weights()
-
-            torch.cuda.empty_cache()
+                # emptying the cache per chunk would force the next loads
+                # back onto slow cudaMalloc, only release once at the end.
+                torch.cuda.empty_cache()
 
     @torch.inference_mode()
     def sleep(self, level: int = 1):
@@ -473,12 +473,11 @@ class StepContext:
         if target_position_ids is not None:
             return attention_mask, target_position_ids
 
-        # position_ids
-        indices = attention_mask.long().cumsum(-1) - 1
-        position_ids = indices + history_seqlens.unsqueeze(-1)
-        indices[1:] += q_seqlens.cumsum(0)[:-1, None]
-        position_ids_1d = position_ids.new_empty(num_tokens)
-        position_ids_1d[indices.flatten()] = position_ids.flatten()
+        # position_ids, token t of sequence i is history_seqlens[i] plus
+        # its offset from the sequence start.
+        q_start_loc = q_seqlens.cumsum(0) - q_seqlens
+        seq_starts = history_seqlens - q_start_loc
+        position_ids_1d = torch.arange(num_tokens, device=device) + seq_starts.repeat_interleave(q_seqlens)
         position_ids = position_ids_1d[None]
         return attention_mask, position_ids
 
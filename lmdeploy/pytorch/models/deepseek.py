@@ -1,5 +1,6 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 
+import re
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import torch
@@ -16,6 +17,8 @@ from lmdeploy.pytorch.weight_loader.model_weight_loader import load_weight
 
 from .utils.cudagraph import CudaGraphMixin
 
+_EXPERT_WEIGHT_REGEX = re.compile(r'\.experts\.(\d+)\.(gate|up|down)_proj')
+
 
 class DeepseekAttention(nn.Module):
     """Rewrite module of MistralAttention."""
@@ -93,7 +96,9 @@ class DeepseekAttention(nn.Module):
             attn_metadata,
             k_scales_zeros=None if len(past_key_value) == 2 else past_key_value[2],
             v_scales_zeros=None if len(past_key_value) == 2 else past_key_value[3],
-            inplace=True,
+            # inplace would return a strided view of the qkv buffer on
+            # some backends, forcing the reshape below to copy.
+            inplace=False,
         )
         attn_output = attn_output.reshape(*hidden_states.shape[:-1], -1)
 
@@ -107,6 +112,7 @@ class DeepseekMoE(nn.Module):
 
     def __init__(self, config: PretrainedConfig, dtype: torch.dtype = None, device: torch.device = None):
         super().__init__()
+        quantization_config = getattr(config, 'quantization_config', None)
         self.hidden_dim = config.hidden_size
         self.ffn_dim = config.moe_intermediate_size
         self.num_experts = config.n_routed_experts
@@ -137,17 +143,20 @@ class DeepseekMoE(nn.Module):
             dtype=dtype,
             device=device,
             all_reduce=False,
+            quant_config=quantization_config,
         )
 
         self.shared_experts = None
         if config.n_shared_experts is not None:
             intermediate_size = (config.moe_intermediate_size * config.n_shared_experts)
+            # replicate the shared experts so their output is complete on
+            # every rank and can overlap the routed-expert all-reduce.
             self.shared_experts = DeepseekMLP(
                 config=config,
                 intermediate_size=intermediate_size,
                 dtype=dtype,
                 device=device,
-                is_tp=True,
+                is_tp=False,
                 all_reduce=False,
             )
         world_size, _ = get_tp_world_rank()
@@ -169,14 +178,21 @@ class DeepseekMoE(nn.Module):
             topk_ids,
         )
 
+        handle = None
+        if self._all_reduce:
+            # launch the routed-expert reduction early so it overlaps the
+            # shared-expert computation.
+            handle = dist.all_reduce(out_states, async_op=True)
+
         if self.shared_experts is not None:
             shared_states = self.shared_experts(hidden_states)
+
+        if handle is not None:
+            handle.wait()
+        if self.shared_experts is not None:
             out_states += shared_states
         out_states = out_states.reshape(batch_size, sequence_length, -1)
 
-        if self._all_reduce:
-            dist.all_reduce(out_states)
-
         return out_states
 
 
@@ -445,19 +461,19 @@ class DeepseekForCausalLM(nn.Module, CudaGraphMixin):
             inputs_embeds=inputs_embeds,
         )
 
-    def _load_weight_experts(self, name: str, loaded_weight: torch.Tensor, params_dict: Dict[str, nn.Parameter],
-                             expert_params_mapping: List):
+    def _load_weight_experts(self, name: str, loaded_weight: torch.Tensor, params_dict: Dict[str, nn.Parameter]):
         """Load weight experts."""
-        for (param_name, weight_name, expert_id, shard_id) in expert_params_mapping:
-            if weight_name not in name:
-                continue
-            name = name.replace(weight_name, param_name)
-            param = params_dict[name]
-            load_weight(param, loaded_weight, expert_id=expert_id, shard_id=shard_id)
-            break
-        else:
+        match = _EXPERT_WEIGHT_REGEX.search(name)
+        if match is None:
             param = params_dict[name]
             load_weight(param, loaded_weight)
+            return
+        expert_id = int(match.group(1))
+        shard_id = match.group(2)
+        param_name = '.experts.gate_up' if shard_id in ('gate', 'up') else '.experts.down'
+        name = name[:match.start()] + param_name + name[match.end():]
+        param = params_dict[name]
+        load_weight(param, loaded_weight, expert_id=expert_id, shard_id=shard_id)
 
     def load_weights(self, weights: Iterable[Tuple[str, torch.Tensor]]):
         """Load weights."""
@@ -471,14 +487,6 @@ class DeepseekForCausalLM(nn.Module, CudaGraphMixin):
             ('.gate_up_proj', '.up_proj', 1),
         ]
 
-        num_experts = self.config.n_routed_experts
-        expert_params_mapping = []
-        for exp_id in range(num_experts):
-            gate_param = ('.experts.gate_up', f'.experts.{exp_id}.gate_proj', exp_id, 'gate')
-            up_param = ('.experts.gate_up', f'.experts.{exp_id}.up_proj', exp_id, 'up')
-            down_param = ('.experts.down', f'.experts.{exp_id}.down_proj', exp_id, 'down')
-            expert_params_mapping += [gate_param, up_param, down_param]
-
         params_dict = dict(self.named_parameters())
         for name, loaded_weight in weights:
             if 'rotary_emb.inv_freq' in name:
@@ -488,7 +496,7 @@ class DeepseekForCausalLM(nn.Module, CudaGraphMixin):
             if self.config.tie_word_embeddings and 'lm_head.weight' in name:
                 continue
             if '.experts' in name:
-                self._load_weight_experts(name, loaded_weight, params_dict, expert_params_mapping=expert_params_mapping)
+                self._load_weight_experts(name, loaded_weight, params_dict)
             else:
                 for (param_name, weight_name, shard_id) in stacked_params_mapping:
                     if weight_name not in name:
@@ -738,14 +738,21 @@ class DeepseekV2MoE(nn.Module):
             topk_ids,
         )
 
+        handle = None
+        if self._all_reduce:
+            # the shared experts are replicated, overlap their compute
+            # with the routed-expert reduction.
+            handle = dist.all_reduce(out_states, async_op=True)
+
         if self.shared_experts is not None:
             shared_states = self.shared_experts(hidden_states)
+
+        if handle is not None:
+            handle.wait()
+        if self.shared_experts is not None:
             out_states += shared_states
         out_states = out_states.reshape(batch_size, sequence_length, -1)
 
-        if self._all_reduce:
-            dist.all_reduce(out_states)
-
         return out_states
 
 
@@ -761,17 +768,10 @@ class DeepseekV2MLP(nn.Module):
         super().__init__()
         quantization_config = getattr(config, 'quantization_config', None)
         if is_shared_expert:
-            dist_config = get_dist_manager().current_config()
-            dp = dist_config.dp
-            if dp == 1:
-                # split weight, do all reduce in moe
-                is_tp = True
-                all_reduce = False
-            else:
-                # do not split weight on dp
-                # TODO: support dp+tp?
-                is_tp = False
-                all_reduce = False
+            # do not split weight, keep the output complete on every rank
+            # so moe can overlap its all reduce with the shared experts.
+            is_tp = False
+            all_reduce = False
         else:
             all_reduce = True
             is_tp = True
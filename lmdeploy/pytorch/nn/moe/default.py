@@ -93,6 +93,9 @@ class LinearWeights(nn.Module):
 
         expert_map = self.expert_map
         param_ids = expert_map[expert_id]
+        if len(param_ids) > 1:
+            # upload once, replicas are filled with cheap d2d copies.
+            loaded_weight = loaded_weight.to(param.device)
         for param_id in param_ids:
             if shard_id == 'gate':
                 param_data = param.data[param_id, :self.half_out]
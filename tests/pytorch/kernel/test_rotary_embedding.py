@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+from lmdeploy.pytorch.backends.default import rotary_embedding
+from lmdeploy.pytorch.backends.default.rotary_embedding import RotaryEmbeddingImpl, _rotary_embedding_fwd
+
+
+class TestRotaryEmbeddingCache:
+
+    @pytest.fixture
+    def dim(self):
+        yield 64
+
+    @pytest.fixture
+    def max_position_embeddings(self):
+        yield 128
+
+    @pytest.fixture
+    def step_ctx(self, monkeypatch, max_position_embeddings):
+        """Stub the step context so forward gets a host-side seqlen bound."""
+        ctx = SimpleNamespace(max_kv_seqlen=max_position_embeddings)
+        mgr = SimpleNamespace(current_context=lambda: ctx)
+        monkeypatch.setattr(rotary_embedding, 'get_step_ctx_manager', lambda: mgr)
+        yield ctx
+
+    @pytest.fixture
+    def impl(self, dim, max_position_embeddings):
+        yield RotaryEmbeddingImpl(dim, max_position_embeddings=max_position_embeddings)
+
+    def _gt(self, impl, position_ids, dtype):
+        return _rotary_embedding_fwd(position_ids,
+                                     impl.inv_freq,
+                                     scaling_factor=impl.scaling_factor,
+                                     dtype=dtype,
+                                     device_type='cuda')
+
+    def test_cached_matches_direct(self, impl, dim, max_position_embeddings, step_ctx):
+        dtype = torch.float16
+        position_ids = torch.randint(0, max_position_embeddings, (1, 16), device='cuda')
+        x = torch.rand(1, 16, dim, dtype=dtype, device='cuda')
+        cos, sin = impl(x, position_ids)
+        gt_cos, gt_sin = self._gt(impl, position_ids, dtype)
+        torch.testing.assert_close(cos, gt_cos)
+        torch.testing.assert_close(sin, gt_sin)
+
+    def test_out_of_table_fallback(self, impl, dim, max_position_embeddings, step_ctx):
+        dtype = torch.float16
+        # build the table, then query beyond its capacity.
+        x = torch.rand(1, 4, dim, dtype=dtype, device='cuda')
+        impl(x, torch.zeros(1, 4, dtype=torch.long, device='cuda'))
+        table_ptr = impl._cos_cached.data_ptr()
+
+        step_ctx.max_kv_seqlen = max_position_embeddings + 64
+        position_ids = torch.arange(max_position_embeddings + 64, device='cuda')[None]
+        x = torch.rand(1, position_ids.size(1), dim, dtype=dtype, device='cuda')
+        cos, sin = impl(x, position_ids)
+        gt_cos, gt_sin = self._gt(impl, position_ids, dtype)
+        torch.testing.assert_close(cos, gt_cos)
+        torch.testing.assert_close(sin, gt_sin)
+        # the table must never be reallocated.
+        assert impl._cos_cached.data_ptr() == table_ptr
+
+    def test_linear_scaling_capacity(self, dim, max_position_embeddings):
+        # linear-scaled models keep the original max_position_embeddings
+        # in their config, the table must cover the scaled window.
+        impl = RotaryEmbeddingImpl(dim, scaling_factor=4.0, max_position_embeddings=max_position_embeddings)
+        assert impl._cache_len == 4 * max_position_embeddings
+
+    def test_graph_replay(self, impl, dim, max_position_embeddings, step_ctx):
+        dtype = torch.float16
+        batch_size = 4
+        x = torch.rand(1, batch_size, dim, dtype=dtype, device='cuda')
+        position_ids = torch.zeros(1, batch_size, dtype=torch.long, device='cuda')
+        # warmup builds the table before capture.
+        impl(x, position_ids)
+        table_ptr = impl._cos_cached.data_ptr()
+
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph):
+            cos, sin = impl(x, position_ids)
+
+        # an eager call that previously forced a table growth must not
+        # reallocate the table under the captured graph.
+        step_ctx.max_kv_seqlen = max_position_embeddings + 64
+        long_position_ids = torch.arange(max_position_embeddings + 64, device='cuda')[None]
+        long_x = torch.rand(1, long_position_ids.size(1), dim, dtype=dtype, device='cuda')
+        impl(long_x, long_position_ids)
+        assert impl._cos_cached.data_ptr() == table_ptr
+
+        # replayed cos/sin must match the eager computation, including
+        # for positions beyond the table capacity.
+        new_position_ids = torch.randint(0, max_position_embeddings + 64, (1, batch_size), device='cuda')
+        position_ids.copy_(new_position_ids)
+        graph.replay()
+        gt_cos, gt_sin = self._gt(impl, new_position_ids, dtype)
+        torch.testing.assert_close(cos, gt_cos)
+        torch.testing.assert_close(sin, gt_sin)